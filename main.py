@@ -2,19 +2,24 @@ import streamlit as st
 from streamlit_option_menu import option_menu
 from supabase import create_client
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-import numpy as np
-import altair as alt
 import plotly.express as px
 import bcrypt
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
 
 # Load environment variables
 SUPABASE_URL = st.secrets["supabase"]["url"]
 SUPABASE_KEY = st.secrets["supabase"]["api_key"]
 
-# Initialize Supabase client
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+# Initialize Supabase client once and share it across reruns and sessions
+# (no spinner, as the background refresh may create it off the script thread)
+@st.cache_resource(show_spinner=False)
+def get_supabase():
+    return create_client(SUPABASE_URL, SUPABASE_KEY)
 
 # Retrieve credentials
 USERNAME = st.secrets["auth"]["username"]
@@ -88,52 +93,321 @@ st.markdown(
 
 #########################################
 #### Functions
-# Fetch data from Supabase
-@st.cache_data(ttl=60)
+# Columns used by the dashboard
+COLUMNS = (
+    "Prediction_ID", "created_at", "N", "P", "K", "Temperature", "Humidity", "pH", "Rainfall",
+    "Latitude", "Longitude", "Location", "Crop", "User_Selected_Crop", "Feedback_Message", "Feedback_Received",
+)
+
+# Cached data is refreshed in the background once older than REFRESH_AFTER
+# seconds and expires outright after CACHE_TTL seconds
+REFRESH_AFTER = 60
+CACHE_TTL = 300
+
+# Above this many points the map switches from pins to a density layer
+MAP_DENSITY_THRESHOLD = 5000
+
+# Compact dtypes applied right after fetching
+DTYPES = {
+    "N": "float32",
+    "P": "float32",
+    "K": "float32",
+    "Temperature": "float32",
+    "Humidity": "float32",
+    "pH": "float32",
+    "Rainfall": "float32",
+    "Latitude": "float32",
+    "Longitude": "float32",
+    "Location": "category",
+    "Crop": "category",
+}
+
+# Fetch data from Supabase (cached per refresh generation by fetch_clean_data)
 def fetch_data():
-    response = supabase.table("crop_predictions").select("*").execute()
+    # Read the deduplicated, normalized view (see sql/v_crop_predictions_clean.sql)
+    response = get_supabase().table("v_crop_predictions_clean").select(",".join(COLUMNS)).execute()
     if response and response.data:
-        return pd.DataFrame(response.data)
-    st.warning("No data available from Supabase.")
-    return pd.DataFrame()
+        df = pd.DataFrame.from_records(response.data, columns=COLUMNS).astype(DTYPES)
+        df["Prediction_ID"] = pd.to_numeric(df["Prediction_ID"], downcast="integer")
+        return df
+    # Empty frame with the same schema, so cleaning and the pages still work
+    return pd.DataFrame(columns=COLUMNS).astype(DTYPES)
 
 # Clean the data
 def clean_data(df):
     """
     Cleans the input dataframe by:
-    - Removing duplicates
-    - Standardizing location names
-    - Filtering out test locations (e.g., Nairobi)
     - Converting 'created_at' to datetime with the correct format and timezone (EAT)
+
+    Deduplication, location standardization and removal of the Nairobi test
+    location are done by the v_crop_predictions_clean view.
     """
     # Create a copy of the dataframe
     clean_df = df.copy()
 
-    # Drop duplicates based on key measurement columns
-    clean_df.drop_duplicates(subset=["N", "P", "K", "Temperature", "Humidity", "pH", "Rainfall", "Latitude", "Longitude", "Crop"], inplace=True)
+    # Convert 'created_at' (ISO 8601 from Supabase) to datetime, treating naive timestamps as UTC
+    clean_df["created_at"] = pd.to_datetime(clean_df["created_at"], format="ISO8601", utc=True)
 
-    # Standardize location names
-    clean_df["Location"] = clean_df["Location"].replace("Muranga County", "Murang'a")
+    # Convert to East Africa Time (EAT, UTC+3)
+    clean_df["created_at"] = clean_df["created_at"].dt.tz_convert("Africa/Nairobi")
 
-    # Remove test location (Nairobi)
-    clean_df = clean_df[clean_df["Location"] != "Nairobi County"]
+    # Extract formatted date and time separately (highly repeated, so stored as categories)
+    clean_df["date"] = clean_df["created_at"].dt.strftime("%Y-%m-%d").astype("category")  # YYYY-MM-DD format
+    clean_df["time_eat"] = clean_df["created_at"].dt.strftime("%H:%M:%S").astype("category")  # HH:MM:SS format
 
-    # Convert 'created_at' to datetime
-    clean_df["created_at"] = pd.to_datetime(clean_df["created_at"])
+    return clean_df
 
-    # Check if the column is timezone-aware
-    if clean_df["created_at"].dt.tz is None:
-        # If not timezone-aware, localize to UTC first
-        clean_df["created_at"] = clean_df["created_at"].dt.tz_localize("UTC")
+# Fetch and clean the data, and count tests per location, once per refresh generation.
+# No spinner: the background refresh calls this off the script thread, where
+# Streamlit elements are unavailable (current_generation shows one instead).
+@st.cache_data(ttl=CACHE_TTL, max_entries=2, show_spinner=False)
+def fetch_clean_data(generation):
+    cleaned_df = clean_data(fetch_data())
+
+    # Home page data leaves out missing and invalid locations (the Feedback page keeps them)
+    home_df = cleaned_df[cleaned_df["Location"].notna() & ~cleaned_df["Location"].isin(["N/A", "Not found"])]
+    home_df = home_df.assign(Location=home_df["Location"].cat.remove_unused_categories())
+
+    # Tests per location
+    loc_counts = home_df["Location"].value_counts().rename_axis("Location").reset_index(name="Tests").astype({"Location": str})
+
+    return cleaned_df, home_df, loc_counts
+
+# Refresh state shared by all sessions
+@st.cache_resource
+def get_refresh_state():
+    return {
+        "lock": threading.Lock(),
+        "executor": ThreadPoolExecutor(max_workers=1),
+        "generation": 0,
+        "fetched_at": None,  # Set once the first generation is fetched
+        "pending": False,
+    }
+
+# Warm the cache for the next generation, then switch readers over to it.
+# Runs on the executor thread, so failures are logged rather than shown.
+def refresh_data(state, generation):
+    try:
+        fetch_clean_data(generation)
+    except Exception:
+        logger.exception("Background refresh of generation %s failed", generation)
+        with state["lock"]:
+            state["pending"] = False
+        return
+
+    with state["lock"]:
+        state["generation"] = max(state["generation"], generation)
+        state["fetched_at"] = time.time()
+        state["pending"] = False
+
+# Return the data generation to read, refreshing it in the background once stale
+def current_generation():
+    state = get_refresh_state()
+    with state["lock"]:
+        age = None if state["fetched_at"] is None else time.time() - state["fetched_at"]
+
+        # Nothing usable is cached (first run or past the hard expiry): fetch now
+        if age is None or age > CACHE_TTL:
+            generation = state["generation"] + 1
+            with st.spinner("Loading data from Supabase..."):
+                fetch_clean_data(generation)
+            state["generation"] = generation
+            state["fetched_at"] = time.time()
+        elif age > REFRESH_AFTER and not state["pending"]:
+            state["pending"] = True
+            state["executor"].submit(refresh_data, state, state["generation"] + 1)
+
+        return state["generation"]
+
+# Build the soil test locations map
+# The figure builders are keyed on the data generation, so the frame itself
+# (underscore argument) is not hashed
+@st.cache_data(ttl=CACHE_TTL, max_entries=64)
+def build_map_fig(generation, _map_df, selected_location):
+    # Filter data based on user selection
+    map_df = _map_df
+    if selected_location != "All Locations":
+        map_df = map_df[map_df["Location"] == selected_location]
+
+    if len(map_df) > MAP_DENSITY_THRESHOLD:
+        # Too many pins to draw individually, show a density layer instead
+        map_fig = px.density_map(
+            map_df,
+            lat="Latitude",
+            lon="Longitude",
+            hover_name="Location",
+            hover_data={"Latitude": ":.4f", "Longitude": ":.4f", "Crop": True, "pH": ":.2f"},  # Show extra details
+            radius=10,
+            title="Soil Test Density in Kenya & Tanzania"
+        )
+    else:
+        # Create an interactive Plotly map with LARGE pins
+        map_fig = px.scatter_map(
+            map_df,
+            lat="Latitude",
+            lon="Longitude",
+            hover_name="Location",
+            hover_data={"Latitude": ":.4f", "Longitude": ":.4f", "Crop": True, "pH": ":.2f"},  # Show extra details
+            color_discrete_sequence=["red"],  # Pin color
+            title="Soil Test Locations in Kenya & Tanzania"
+        )
+
+        # Make the pins BIG and VISIBLE
+        map_fig.update_traces(
+            marker=dict(
+                size=15,  # **Increased Pin Size**
+                color="red",
+                symbol="circle",
+                opacity=0.9  # Slight transparency for better visualization
+            )
+        )
+
+    # Improve map appearance
+    map_fig.update_layout(
+        map_style="open-street-map",  # Better map details
+        map_center={"lat": -2.0, "lon": 37.0},  # Center on East Africa
+        map_zoom=6,  # Adjusted zoom level
+        margin=dict(l=10, r=10, t=40, b=10),
+        height=500  # Adjusted for better UI fit
+    )
 
-    # Convert to East Africa Time (EAT, UTC+3)
-    clean_df["created_at"] = clean_df["created_at"].dt.tz_convert("Africa/Nairobi")
+    return map_fig
+
+# Build the tests per location bar chart
+@st.cache_data(ttl=CACHE_TTL, max_entries=64)
+def build_bar_fig(generation, _location_counts, location):
+    # Create interactive Plotly bar chart
+    fig = px.bar(
+        _location_counts,
+        x="Location",
+        y="Tests",
+        color="Location",  # Distinct color per location
+        title="Tests Conducted Across Locations" if location == "All Locations" else f"Tests Conducted in {location}",
+        labels={"Location": "Location", "Tests": "Number of Tests"},
+        color_discrete_sequence=px.colors.qualitative.Vivid,  # Beautiful color scheme
+        text_auto=True,  # Show values on bars
+    )
 
-    # Extract formatted date and time separately
-    clean_df["date"] = clean_df["created_at"].dt.strftime("%Y-%m-%d")  # YYYY-MM-DD format
-    clean_df["time_eat"] = clean_df["created_at"].dt.strftime("%H:%M:%S")  # HH:MM:SS format
+    # Improve layout
+    fig.update_layout(
+        xaxis_tickangle=-30,  # Rotate labels for readability
+        xaxis_title="Location",
+        yaxis_title="Number of Tests",
+        title_font=dict(size=16, family="Arial", color="black"),
+        plot_bgcolor="rgba(0,0,0,0)",  # Transparent background
+        paper_bgcolor="rgba(0,0,0,0)",
+        legend_title="Location",
+        margin=dict(l=40, r=40, t=40, b=40),
+    )
 
-    return clean_df
+    return fig
+
+# Build the soil test dates scatter plot
+@st.cache_data(ttl=CACHE_TTL, max_entries=2)
+def build_scatter_fig(generation, _view):
+    # Create scatter plot
+    scatter_fig = px.scatter(
+        _view,
+        x="date",
+        y="Location",
+        color="Location",  # Differentiate by color
+        hover_data={"created_at": True, "time_eat": True, "Location": False},  # Show EAT time on hover
+        title="Soil Test Dates by County (EAT Time)",
+        render_mode="webgl",  # Draw points with WebGL (Scattergl) so large tables stay responsive
+    )
+
+    # Adjust marker size and background
+    scatter_fig.update_traces(marker=dict(size=8))  # Reduce marker size
+
+    scatter_fig.update_layout(
+        xaxis_title="Date",
+        yaxis_title="County",
+        hovermode="closest",
+        width=800,  # Reduced width
+        height=450,  # Reduced height
+        margin=dict(l=20, r=20, t=40, b=40),
+        font=dict(size=10),
+        plot_bgcolor="rgba(0,0,0,0)",  # Transparent plot background
+        paper_bgcolor="rgba(0,0,0,0)",  # Transparent outer background
+    )
+
+    return scatter_fig
+
+# Build the feedback editor table once per data generation. Held with
+# cache_resource so reruns reuse the same frame without unpickling a copy;
+# st.data_editor and the submit handler only read it.
+@st.cache_resource(ttl=CACHE_TTL, max_entries=2, show_spinner=False)
+def feedback_view(generation, _df):
+    return _df[[
+        "Prediction_ID", "created_at", "N", "P", "K", "Temperature", "Humidity", "Rainfall", "Location", "Crop", "User_Selected_Crop", "Feedback_Message",
+    ]].rename(columns={
+        "Prediction_ID": "ID",
+        "created_at": "Date",
+        "N": "Nitrogen",
+        "P": "Phosphorus",
+        "K": "Potassium",
+        "Temperature": "Temperature (°C)",
+        "Humidity": "Humidity (%)",
+        "Rainfall": "Rainfall (mm)",
+        "Crop": "Recommended Crop",
+        "User_Selected_Crop": "Farmer Selected Crop",
+        "Feedback_Message": "Feedback Message"
+    }, copy=False)
+
+# Soil test locations map, rerun on its own when its selectbox changes
+@st.fragment
+def map_panel(generation, home_df):
+    # 🗺️ Interactive Soil Test Locations Map
+    st.subheader("🌍 Soil Test Locations in East Africa")
+
+    # Remove missing lat/lon values
+    map_df = home_df.dropna(subset=["Latitude", "Longitude"])
+
+    # Allow users to select a location (only those with coordinates left)
+    location_options = ["All Locations", *map_df["Location"].cat.remove_unused_categories().cat.categories]
+    selected_location = st.selectbox("📍 Select a Location", location_options)
+
+    # Build (or reuse) the interactive map and show it in Streamlit
+    st.plotly_chart(build_map_fig(generation, map_df, selected_location), use_container_width=True)
+
+# Tests per location bar chart, rerun on its own when its selectbox changes
+@st.fragment
+def tests_per_location_panel(generation, loc_counts):
+    # Add "All Locations" option
+    location_options = ["All Locations", *loc_counts["Location"]]
+    location = st.selectbox("Select Location", location_options)
+
+    # Filter data based on selection
+    if location == "All Locations":
+        location_counts = loc_counts
+    else:
+        location_counts = loc_counts[loc_counts["Location"] == location]
+
+    # Check if data is available
+    if location_counts.empty:
+        st.warning(f"No tests recorded for {location}.")
+    else:
+        # Build (or reuse) the bar chart and show it in Streamlit
+        st.plotly_chart(build_bar_fig(generation, location_counts, location), use_container_width=True)
+
+# Editable feedback columns in the editor table
+FEEDBACK_COLUMNS = ["Farmer Selected Crop", "Feedback Message"]
+
+# Flag feedback cells that differ from the frame passed to the editor
+def feedback_changes(edited_df, original_df):
+    """
+    Returns a boolean frame over edited_df's feedback columns that is True for
+    each changed cell. Empty cells (None, NaN or "") compare as equal and rows
+    added in the editor are compared against blanks.
+    """
+    original = original_df[FEEDBACK_COLUMNS].reindex(edited_df.index)
+    return edited_df[FEEDBACK_COLUMNS].fillna("") != original.fillna("")
+
+# Check a password against the stored hash, reusing the result for repeated attempts.
+# The hash is an argument so a rotated hash in secrets gets its own cache entries.
+@st.cache_data(show_spinner=False, max_entries=32)
+def verify_password(password, password_hash):
+    return bcrypt.checkpw(password, password_hash)
 
 # Authenticate the user first 
 def login():
@@ -146,7 +420,7 @@ def login():
 
     # Login button
     if st.button("Login"):
-        if username == USERNAME and bcrypt.checkpw(password.encode(), PASSWORD_HASH) == 1:
+        if username == USERNAME and verify_password(password.encode(), PASSWORD_HASH):
             st.success(f"Welcome {USERNAME}!")
             st.session_state["authenticated"] = True
         else:  
@@ -176,9 +450,11 @@ else:
     if selected == "Home":
         st.markdown('<div class="title">Rhea Soil Data Analysis</div>', unsafe_allow_html=True)
 
-        # Fetch data from Supabase
-        df = fetch_data()
-        cleaned_df = clean_data(df) # Clean the data
+        # Fetch and clean data from Supabase
+        generation = current_generation()
+        cleaned_df, home_df, loc_counts = fetch_clean_data(generation)
+        if cleaned_df.empty:
+            st.warning("No data available from Supabase.")
     
         # Create columns
         col1, col2 = st.columns([2, 2])
@@ -196,146 +472,27 @@ else:
                     text-align: center;
                 ">
                     <h3 style="color: #333;">Total Records</h3>
-                    <p style="font-size: 24px; font-weight: bold; color: #007BFF;">{df.shape[0]} samples</p>
+                    <p style="font-size: 24px; font-weight: bold; color: #007BFF;">{cleaned_df.shape[0]} samples</p>
                 </div>
                 """,
                 unsafe_allow_html=True
             )
 
-            # 🗺️ Interactive Soil Test Locations Map
-            st.subheader("🌍 Soil Test Locations in East Africa")
-
-            # Remove missing lat/lon values
-            map_df = cleaned_df.dropna(subset=["Latitude", "Longitude"])
-
-            # Allow users to select a location
-            location_options = ["All Locations"] + list(map_df["Location"].unique())
-            selected_location = st.selectbox("📍 Select a Location", location_options)
-
-            # Filter data based on user selection
-            if selected_location != "All Locations":
-                map_df = map_df[map_df["Location"] == selected_location]
-
-            # Create an interactive Plotly map with LARGE pins
-            map_fig = px.scatter_mapbox(
-                map_df,
-                lat="Latitude",
-                lon="Longitude",
-                hover_name="Location",
-                hover_data={"Latitude": True, "Longitude": True, "Crop": True, "pH": True},  # Show extra details
-                color_discrete_sequence=["red"],  # Pin color
-                title="Soil Test Locations in Kenya & Tanzania"
-            )
-
-            # Make the pins BIG and VISIBLE
-            map_fig.update_traces(
-                marker=dict(
-                    size=15,  # **Increased Pin Size**
-                    color="red",
-                    symbol="circle",
-                    opacity=0.9  # Slight transparency for better visualization
-                )
-            )
-
-            # Improve map appearance
-            map_fig.update_layout(
-                mapbox_style="open-street-map",  # Better map details
-                mapbox_center={"lat": -2.0, "lon": 37.0},  # Center on East Africa
-                mapbox_zoom=6,  # Adjusted zoom level
-                margin=dict(l=10, r=10, t=40, b=10),
-                height=500  # Adjusted for better UI fit
-            )
-
-            # Show the interactive map in Streamlit
-            st.plotly_chart(map_fig, use_container_width=True)
+            # Map panel reruns on its own when its location changes
+            map_panel(generation, home_df)
         
         # Column 2: Location-based test
         with col2:
             st.subheader("Tests Per Location")
 
-            # Remove missing and invalid locations
-            cleaned_df = cleaned_df[~cleaned_df["Location"].isin(["N/A", "Not found", None])]
-
-            # Add "All Locations" option
-            location_options = ["All Locations"] + list(cleaned_df["Location"].unique())
-            location = st.selectbox("Select Location", location_options)
-
-            # Filter data based on selection
-            if location == "All Locations":
-                location_counts = cleaned_df["Location"].value_counts().reset_index()
-                location_counts.columns = ["Location", "Tests"]
-            else:
-                location_df = cleaned_df[cleaned_df["Location"] == location]
-                location_counts = location_df["Location"].value_counts().reset_index()
-                location_counts.columns = ["Location", "Tests"]
-
-            # Check if data is available
-            if location_counts.empty:
-                st.warning(f"No tests recorded for {location}.")
-            else:
-                # Create interactive Plotly bar chart
-                fig = px.bar(
-                    location_counts,
-                    x="Location",
-                    y="Tests",
-                    color="Location",  # Distinct color per location
-                    title="Tests Conducted Across Locations" if location == "All Locations" else f"Tests Conducted in {location}",
-                    labels={"Location": "Location", "Tests": "Number of Tests"},
-                    color_discrete_sequence=px.colors.qualitative.Vivid,  # Beautiful color scheme
-                    text_auto=True,  # Show values on bars
-                )
-
-                # Improve layout
-                fig.update_layout(
-                    xaxis_tickangle=-30,  # Rotate labels for readability
-                    xaxis_title="Location",
-                    yaxis_title="Number of Tests",
-                    title_font=dict(size=16, family="Arial", color="black"),
-                    plot_bgcolor="rgba(0,0,0,0)",  # Transparent background
-                    paper_bgcolor="rgba(0,0,0,0)",
-                    legend_title="Location",
-                    margin=dict(l=40, r=40, t=40, b=40),
-                )
-
-                # Show chart in Streamlit
-                st.plotly_chart(fig, use_container_width=True)
+            # Bar chart panel reruns on its own when its location changes
+            tests_per_location_panel(generation, loc_counts)
             
             # Scatter plot for test dates
             st.subheader("Soil Test Dates by County (EAT Time)")
 
-            # Convert `created_at` to datetime (UTC)
-            cleaned_df["created_at"] = pd.to_datetime(cleaned_df["created_at"], utc=True)
-
-            # Convert to East Africa Time (EAT, UTC+3)
-            cleaned_df["created_at_eat"] = cleaned_df["created_at"].dt.tz_convert("Africa/Nairobi")
-
-            # Create scatter plot
-            scatter_fig = px.scatter(
-                cleaned_df,
-                x="date",
-                y="Location",
-                color="Location",  # Differentiate by color
-                hover_data={"created_at_eat": True, "time_eat": True, "Location": False},  # Show EAT time on hover
-                title="Soil Test Dates by County (EAT Time)",
-            )
-
-            # Adjust marker size and background
-            scatter_fig.update_traces(marker=dict(size=8))  # Reduce marker size
-
-            scatter_fig.update_layout(
-                xaxis_title="Date",
-                yaxis_title="County",
-                hovermode="closest",
-                width=800,  # Reduced width
-                height=450,  # Reduced height
-                margin=dict(l=20, r=20, t=40, b=40),
-                font=dict(size=10),
-                plot_bgcolor="rgba(0,0,0,0)",  # Transparent plot background
-                paper_bgcolor="rgba(0,0,0,0)",  # Transparent outer background
-            )
-
-            # Display scatter plot
-            st.plotly_chart(scatter_fig, use_container_width=True)
+            # Build (or reuse) the scatter plot and show it in Streamlit
+            st.plotly_chart(build_scatter_fig(generation, home_df), use_container_width=True)
 
     ########################################
     #### Feedback Page
@@ -343,62 +500,71 @@ else:
         # Title
         st.markdown('<div class="title">Rhea - Agronomist Feedback System</div>', unsafe_allow_html=True)
 
-        # Fetch data from Supabase
-        df = fetch_data()
-        cleaned_df = clean_data(df)
+        # Fetch and clean data from Supabase
+        generation = current_generation()
+        cleaned_df, _, _ = fetch_clean_data(generation)
 
         # Display data in an editable format
-        if not df.empty:
+        if not cleaned_df.empty:
             st.subheader("Crop Recommendations")
             st.subheader("Just edit the 'Feedback Message' column and click 'Submit Feedback' to update the feedback.")
 
-            df_filtered = cleaned_df[[
-                "Prediction_ID", "created_at", "N", "P", "K", "Temperature", "Humidity", "Rainfall", "Location", "Crop", "User_Selected_Crop", "Feedback_Message",
-            ]].copy()
-            
-            df_filtered.rename(columns={
-                "Prediction_ID": "ID",
-                "created_at": "Date",
-                "N": "Nitrogen",
-                "P": "Phosphorus",
-                "K": "Potassium",
-                "Temperature": "Temperature (°C)",
-                "Humidity": "Humidity (%)",
-                "Rainfall": "Rainfall (mm)",
-                "Crop": "Recommended Crop",
-                "User_Selected_Crop": "Farmer Selected Crop",
-                "Feedback_Message": "Feedback Message"
-            }, inplace=True)
-            
-            
+            # Columns shown in the editor, with display names
+            df_filtered = feedback_view(generation, cleaned_df)
+
             edited_df = st.data_editor(df_filtered, num_rows="dynamic", use_container_width=True)
 
             if st.button("Submit Feedback"):
-                for index, row in edited_df.iterrows():
-                    try:
-                        prediction_id = int(row["ID"])
-                    except ValueError:
-                        st.error(f"Invalid Prediction_ID: {row['ID']}")
-                        continue
-
-                    selected_crop = row["Farmer Selected Crop"] if row["Farmer Selected Crop"] else None
-                    feedback_message = row["Feedback Message"] if row["Feedback Message"] else None
-
+                # Keep only rows whose feedback columns differ from what was rendered
+                changed_cells = feedback_changes(edited_df, df_filtered)
+                changed = changed_cells.any(axis=1)
+
+                # Rename to the table's column names so rows can be read as attributes
+                updates = edited_df.loc[changed, ["ID"] + FEEDBACK_COLUMNS].rename(columns={
+                    "ID": "Prediction_ID",
+                    "Farmer Selected Crop": "User_Selected_Crop",
+                    "Feedback Message": "Feedback_Message",
+                })
+
+                # Blank out the cells that were not edited so only changed values are sent
+                feedback_fields = ["User_Selected_Crop", "Feedback_Message"]
+                updates[feedback_fields] = updates[feedback_fields].where(changed_cells.loc[changed].to_numpy())
+
+                # Invalid IDs become <NA> and are skipped in one pass, as are IDs
+                # that are not in the table (e.g. rows added in the editor)
+                updates["Prediction_ID"] = pd.to_numeric(updates["Prediction_ID"], errors="coerce").astype("Int64")
+                invalid = updates["Prediction_ID"].isna()
+                unknown = ~invalid & ~updates["Prediction_ID"].isin(df_filtered["ID"])
+                for raw_id in edited_df.loc[changed, "ID"][invalid]:
+                    st.error(f"Invalid Prediction_ID: {raw_id}")
+                for prediction_id in updates.loc[unknown, "Prediction_ID"]:
+                    st.error(f"Unknown Prediction_ID: {prediction_id}")
+                updates = updates[~invalid & ~unknown]
+
+                # Build a single payload, sending only the non-empty fields that changed
+                payload = []
+                for row in updates.itertuples(index=False, name="Update"):
                     update_data = {}
-                    if selected_crop:
-                        update_data["User_Selected_Crop"] = selected_crop
-                    if feedback_message:
-                        update_data["Feedback_Message"] = feedback_message
-                        update_data["Feedback_Received"] = True
+                    if pd.notna(row.User_Selected_Crop) and row.User_Selected_Crop:
+                        update_data["User_Selected_Crop"] = row.User_Selected_Crop
+                    if pd.notna(row.Feedback_Message) and row.Feedback_Message:
+                        update_data["Feedback_Message"] = row.Feedback_Message
 
                     if update_data:
-                        response = supabase.table("crop_predictions").update(update_data).eq("Prediction_ID", prediction_id).execute()
-                        response_dict = response.model_dump()
-                        
-                        if "error" in response_dict and response_dict["error"]:  
-                            st.error(f"Failed to update feedback for {prediction_id}: {response_dict['error']}")
-                        else:
-                            st.success(f"Feedback submitted for Prediction_ID: {prediction_id}")
+                        update_data["Prediction_ID"] = int(row.Prediction_ID)
+                        payload.append(update_data)
+
+                if not payload:
+                    st.info("No feedback changes to submit.")
+                else:
+                    # One UPDATE for every changed row (see sql/update_feedback.sql)
+                    response = get_supabase().rpc("update_feedback", {"updates": payload}).execute()
+                    response_dict = response.model_dump()
+
+                    if "error" in response_dict and response_dict["error"]:
+                        st.error(f"Failed to update feedback: {response_dict['error']}")
+                    else:
+                        st.success(f"Feedback submitted for {len(payload)} prediction(s): {', '.join(str(row['Prediction_ID']) for row in payload)}")
         else:
             st.warning("No data available from Supabase.")
     ########################################
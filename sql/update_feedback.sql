@@ -0,0 +1,18 @@
+-- Batched feedback update for the Feedback page.
+-- Takes a JSON array of {"Prediction_ID", "User_Selected_Crop", "Feedback_Message"}
+-- objects and updates the matching existing rows in one statement. Missing or
+-- null fields leave the stored value untouched, Feedback_Received is only ever
+-- set to true (when a message is sent) and unknown IDs are ignored, so no rows
+-- are inserted.
+create or replace function update_feedback(updates jsonb)
+returns table ("Prediction_ID" bigint)
+language sql
+as $$
+    update crop_predictions c
+    set "User_Selected_Crop" = coalesce(u."User_Selected_Crop", c."User_Selected_Crop"),
+        "Feedback_Message" = coalesce(u."Feedback_Message", c."Feedback_Message"),
+        "Feedback_Received" = case when u."Feedback_Message" is not null then true else c."Feedback_Received" end
+    from jsonb_to_recordset(updates) as u("Prediction_ID" bigint, "User_Selected_Crop" text, "Feedback_Message" text)
+    where c."Prediction_ID" = u."Prediction_ID"
+    returning c."Prediction_ID";
+$$;
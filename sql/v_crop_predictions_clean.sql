@@ -0,0 +1,29 @@
+-- Cleaned view of crop_predictions read by the dashboard.
+-- Duplicate measurements are kept once (lowest Prediction_ID), Muranga is
+-- normalised to Murang'a and the Nairobi test location is excluded. Rows with a
+-- missing or unresolved location are kept so they can still get feedback; the
+-- Home page leaves them out in the app.
+create index if not exists crop_predictions_measurement_idx
+    on crop_predictions ("N", "P", "K", "Temperature", "Humidity", "pH", "Rainfall", "Latitude", "Longitude", "Crop", "Prediction_ID");
+
+create or replace view v_crop_predictions_clean as
+select distinct on ("N", "P", "K", "Temperature", "Humidity", "pH", "Rainfall", "Latitude", "Longitude", "Crop")
+    "Prediction_ID",
+    created_at,
+    "N",
+    "P",
+    "K",
+    "Temperature",
+    "Humidity",
+    "pH",
+    "Rainfall",
+    "Latitude",
+    "Longitude",
+    case when "Location" = 'Muranga County' then 'Murang''a' else "Location" end as "Location",
+    "Crop",
+    "User_Selected_Crop",
+    "Feedback_Message",
+    "Feedback_Received"
+from crop_predictions
+where "Location" is distinct from 'Nairobi County'
+order by "N", "P", "K", "Temperature", "Humidity", "pH", "Rainfall", "Latitude", "Longitude", "Crop", "Prediction_ID";